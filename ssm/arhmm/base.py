@@ -3,7 +3,7 @@ Base class for Autoregressive HMM.
 """
 import jax.numpy as np
 import jax.random as jr
-from jax import vmap, lax
+from jax import jit, vmap, lax
 from jax.tree_util import register_pytree_node_class
 from functools import partial
 
@@ -12,6 +12,15 @@ import tensorflow_probability.substrates.jax as tfp
 from ssm.hmm.base import HMM
 from ssm.utils import tree_get, tree_concatenate, auto_batch, tree_map
 
+
+def _push_history(history, emission):
+    """Shift the history of previous emissions back by one step and append the new emission.
+
+    Uses indexed updates rather than stacking ``history[1:]`` and ``emission``
+    so that no new buffer is allocated on each step of a scan.
+    """
+    return history.at[:-1].set(history[1:]).at[-1].set(emission)
+
 @register_pytree_node_class
 class AutoregressiveHMM(HMM):
     r"""Base class for HMM with autoregressive dependencies.
@@ -68,6 +77,13 @@ class AutoregressiveHMM(HMM):
         if history is None:
             history = np.zeros((self.num_lags, *self.emissions_shape))
 
+        # With a single array of discrete states, the terms of the log joint don't
+        # depend on each other, so gather them from the log probability tables
+        # rather than accumulating them one time step at a time. Structured states
+        # (e.g. the factorial states of a TWARHMM) go through the per-step distributions.
+        if isinstance(states, np.ndarray) and np.issubdtype(states.dtype, np.integer):
+            return self._gather_log_probability(states, data, covariates, metadata, history)
+
         lp = 0
 
         # Get the first timestep probability
@@ -78,34 +94,75 @@ class AutoregressiveHMM(HMM):
         lp += self.initial_distribution(covariates=initial_covariates,
                                         metadata=metadata).log_prob(initial_state)
         lp += self.emissions_distribution(initial_state,
-                                            covariates=initial_covariates,
-                                            metadata=metadata,
-                                            history=history).log_prob(initial_data)
+                                          covariates=initial_covariates,
+                                          metadata=metadata,
+                                          history=history).log_prob(initial_data)
 
         def _step(carry, args):
             prev_state, history, lp = carry
             state, emission, covariates = args
             lp += self.dynamics_distribution(prev_state,
-                                                covariates=covariates,
-                                                metadata=metadata).log_prob(state)
+                                             covariates=covariates,
+                                             metadata=metadata).log_prob(state)
             lp += self.emissions_distribution(state,
-                                                covariates=covariates,
-                                                metadata=metadata,
-                                                history=history).log_prob(emission)
-            # new_history = tree_concatenate(tree_get(_history, slice(1, None)), emission[None, ...])
-            new_history = np.row_stack((history[1:], emission))
+                                              covariates=covariates,
+                                              metadata=metadata,
+                                              history=history).log_prob(emission)
+            new_history = _push_history(history, emission)
             return (state, new_history, lp), None
 
         initial_carry = (tree_get(states, 0),
-                            np.row_stack((history[1:], data[0])),
-                            lp)
+                         _push_history(history, data[0]),
+                         lp)
         (_, _, lp), _ = lax.scan(_step, initial_carry,
-                                    (tree_get(states, slice(1, None)),
-                                    tree_get(data, slice(1, None)),
-                                    tree_get(covariates, slice(1, None))))
+                                 (tree_get(states, slice(1, None)),
+                                  tree_get(data, slice(1, None)),
+                                  tree_get(covariates, slice(1, None))))
+        return lp
+
+    def _gather_log_probability(self, states, data, covariates, metadata, history):
+        """Log joint probability of integer states, gathered from the log probability tables."""
+        num_timesteps = len(states)
+        lp = self._initial_condition.log_initial_probs(
+            data, covariates=covariates, metadata=metadata)[states[0]]
+
+        log_P = self._transitions.log_transition_matrices(
+            data, covariates=covariates, metadata=metadata)
+        if log_P.ndim == 2:
+            lp += log_P[states[:-1], states[1:]].sum()
+        else:
+            lp += log_P[np.arange(num_timesteps - 1), states[:-1], states[1:]].sum()
+
+        # Prepend the history so that the first emissions are conditioned on it.
+        # The log likelihoods of the history itself are dropped.
+        log_likes = self._emissions.log_likelihoods(
+            np.concatenate([history, data]), covariates=covariates, metadata=metadata)
+        lp += log_likes[self.num_lags:][np.arange(num_timesteps), states].sum()
         return lp
 
 
+    def default_initial_state(self, key, covariates=None, metadata=None):
+        r"""Sample an initial state from the initial distribution.
+
+        Args:
+            key (jr.PRNGKey): A JAX pseudorandom number generator key.
+            covariates: Optional covariates of the trajectory. Only the first
+                time step is used.
+
+        Returns:
+            initial_state: a sample from :math:`p(x_1)`
+        """
+        return self.initial_distribution(covariates=tree_get(covariates, 0),
+                                         metadata=metadata).sample(seed=key)
+
+    def default_history(self):
+        r"""The history of previous emissions used when none is provided.
+
+        Returns:
+            history: zeros of shape :math:`(\text{num\_lags} , \text{emissions\_dim})`
+        """
+        return np.zeros((self.num_lags, *self.emissions_shape))
+
     def sample(self,
                key,
                num_steps: int,
@@ -126,11 +183,12 @@ class AutoregressiveHMM(HMM):
             covariates: Optional covariates that may be needed for sampling.
                 Default is None.
             initial_state: Optional state on which to condition the sampled trajectory.
-                Default is None which samples the intial state from the initial distribution.
+                Default is None which samples the intial state from the initial distribution
+                (see :meth:`default_initial_state`).
             num_samples (int): Number of indepedent samples (defines a batch dimension).
-            prev_emissions: previous emissions to condition on
+            history: previous emissions to condition on
                 of shape :math:`(\text{[batch]} , \text{num\_lags} , \text{emissions\_dim})`.
-                Default is None which will condition on zeros.
+                Default is None which will condition on zeros (see :meth:`default_history`).
 
         Returns:
             states: an array of latent states across time :math:`x_{1:T}`
@@ -138,55 +196,81 @@ class AutoregressiveHMM(HMM):
             emissions: an array of observations across time :math:`y_{1:T}`
                 of shape :math:`(\text{[batch]} , \text{num\_lags} , \text{emissions\_dim})`.
         """
+        # Treat a single sample as a batch of one so that both cases share the same code.
+        if num_samples > 1:
+            batch_keys = jr.split(key, num_samples)
+        else:
+            add_batch_dim = partial(np.expand_dims, axis=0)
+            batch_keys = key[None]
+            covariates = tree_map(add_batch_dim, covariates)
+            initial_state = tree_map(add_batch_dim, initial_state)
+            history = tree_map(add_batch_dim, history)
+
+        # Fill in the defaults here so that the jitted sampler below only ever
+        # sees arrays and is traced once per shape rather than once per call variant.
+        if initial_state is None:
+            split_keys = vmap(jr.split)(batch_keys)
+            initial_state = vmap(self.default_initial_state, in_axes=(0, 0, None))(
+                split_keys[:, 0], covariates, metadata)
+            batch_keys = split_keys[:, 1]
+        if history is None:
+            default_history = self.default_history()
+            history = np.broadcast_to(default_history, (len(batch_keys), *default_history.shape))
+
+        states, emissions = self._sample(batch_keys, num_steps, initial_state, history,
+                                         covariates=covariates, metadata=metadata)
+
+        if num_samples == 1:
+            states, emissions = tree_get((states, emissions), 0)
 
-        def _sample(key, covariates=None, initial_state=None, history=None):
-            if initial_state is None:
-                key1, key = jr.split(key, 2)
-                initial_covariates = tree_get(covariates, 0)
-                initial_state = self.initial_distribution(covariates=initial_covariates,
-                                                          metadata=metadata).sample(seed=key1)
-            if history is None:
-                history = np.zeros((self.num_lags, *self.emissions_shape))
-                
+        return states, emissions
+
+    @partial(jit, static_argnames=("num_steps",))
+    def _sample(self, keys, num_steps, initial_state, history, covariates=None, metadata=None):
+        """Sample a batch of trajectories given their initial states and histories.
+
+        The batch dimension is kept inside a single scan over time, and each step
+        samples all of the trajectories at once, rather than running one scan per sample.
+        """
+
+        def _initialize(key, covariates, initial_state, history):
+            initial_covariates = tree_get(covariates, 0)
             key1, key = jr.split(key, 2)
             initial_emission = self.emissions_distribution(initial_state,
                                                            covariates=initial_covariates,
                                                            metadata=metadata,
                                                            history=history).sample(seed=key1)
-            history = np.row_stack((history[1:], initial_emission))
+            history = _push_history(history, initial_emission)
+            return jr.split(key, num_steps - 1), initial_emission, history
 
-            def _step(carry, key_and_covariates):
-                history, prev_state = carry
-                key, covariates = key_and_covariates
-                key1, key2 = jr.split(key, 2)
-                state = self.dynamics_distribution(prev_state,
+        def _step(carry, key_and_covariates):
+            history, prev_state = carry
+            key, covariates = key_and_covariates
+            key1, key2 = jr.split(key, 2)
+            state = self.dynamics_distribution(prev_state,
+                                               covariates=covariates,
+                                               metadata=metadata).sample(seed=key1)
+            emission = self.emissions_distribution(state,
                                                    covariates=covariates,
-                                                   metadata=metadata).sample(seed=key1)
-                emission = self.emissions_distribution(state,
-                                                       covariates=covariates,
-                                                       metadata=metadata,
-                                                       history=history).sample(seed=key2)
-                # next_history = tree_concatenate(tree_get(history, slice(1, None)), emission)
-                next_history = np.row_stack((history[1:], emission))
-                return (next_history, state), (state, emission)
-
-            keys = jr.split(key, num_steps - 1)
-            _, (states, emissions) = lax.scan(_step, 
-                                              (history, initial_state), 
-                                              (keys, tree_get(covariates, slice(1, None))))
-            
-            expand_dims_fn = partial(np.expand_dims, axis=0)
-            states = tree_concatenate(tree_map(expand_dims_fn, initial_state), states)
-            emissions = tree_concatenate(tree_map(expand_dims_fn, initial_emission), emissions)
-            
-            return states, emissions
+                                                   metadata=metadata,
+                                                   history=history).sample(seed=key2)
+            next_history = _push_history(history, emission)
+            return (next_history, state), (state, emission)
 
-        if num_samples > 1:
-            batch_keys = jr.split(key, num_samples)
-            states, emissions = vmap(_sample)(batch_keys, covariates, initial_state, history)
-        else:
-            states, emissions = _sample(key, covariates, initial_state, history)
+        keys, initial_emission, history = \
+            vmap(_initialize)(keys, covariates, initial_state, history)
+
+        # Scan over time with the batch as the second axis of the inputs and outputs
+        swap_batch_and_time = partial(np.swapaxes, axis1=0, axis2=1)
+        _, (states, emissions) = lax.scan(vmap(_step),
+                                          (history, initial_state),
+                                          tree_map(swap_batch_and_time,
+                                                   (keys, tree_get(covariates, (slice(None), slice(1, None))))))
+        states, emissions = tree_map(swap_batch_and_time, (states, emissions))
 
+        expand_dims_fn = partial(np.expand_dims, axis=1)
+        states = tree_concatenate(tree_map(expand_dims_fn, initial_state), states, axis=1)
+        emissions = tree_concatenate(tree_map(expand_dims_fn, initial_emission), emissions, axis=1)
         return states, emissions
 
     def __repr__(self):
@@ -1,8 +1,9 @@
 from __future__ import annotations
 from functools import partial
 import jax.numpy as np
-from jax import vmap, lax
-from jax.tree_util import tree_map, register_pytree_node_class
+from jax import jit, vmap, lax
+from jax.scipy.linalg import solve_triangular
+from jax.tree_util import register_pytree_node_class, tree_map
 from tensorflow_probability.substrates import jax as tfp
 
 from ssm.hmm.emissions import Emissions
@@ -11,6 +12,80 @@ import ssm.distributions as ssmd
 tfd = tfp.distributions
 
 
+def _batched_mvn_log_prob(data, means, scale_trils):
+    r"""Gaussian log density of each data point under each state's predictive distribution.
+
+    Equivalent to ``tfd.MultivariateNormalTriL(means, scale_trils).log_prob(data[:, None])``
+    but with a single triangular solve per state and no distribution objects.
+
+    Args:
+        data (np.ndarray): of shape :math:`(\text{num\_timesteps}, \text{dim})`.
+        means (np.ndarray): of shape :math:`(\text{num\_timesteps}, \text{num\_states}, \text{dim})`.
+        scale_trils (np.ndarray): lower triangular Cholesky factors of the covariances
+            of shape :math:`(\text{num\_states}, \text{dim}, \text{dim})`.
+
+    Returns:
+        log_probs (np.ndarray): of shape :math:`(\text{num\_timesteps}, \text{num\_states})`.
+    """
+    dim = data.shape[-1]
+    # Solve against all time steps at once, with time as the right-hand side columns.
+    diff = (data[:, None, :] - means).transpose([1, 2, 0])
+    z = vmap(partial(solve_triangular, lower=True))(scale_trils, diff)
+    half_log_det = np.log(np.diagonal(scale_trils, axis1=-2, axis2=-1)).sum(axis=-1)
+    return -0.5 * (z ** 2).sum(axis=1).T - half_log_det - 0.5 * dim * np.log(2 * np.pi)
+
+
+def _lagged_windows(data, num_lags):
+    r"""Extract the flattened windows of preceding emissions used as regression covariates.
+
+    Args:
+        data (np.ndarray): of shape :math:`(\text{num\_timesteps}, \text{dim})`.
+        num_lags (int): number of preceding emissions in each window.
+
+    Returns:
+        x (np.ndarray): design matrix where ``x[t]`` is ``data[t:t + num_lags].ravel()``,
+            of shape :math:`(\text{num\_timesteps} - \text{num\_lags}, \text{num\_lags} * \text{dim})`.
+    """
+    # Extract all windows at once as image patches of shape (num_lags, dim).
+    x = lax.conv_general_dilated_patches(data[None, None],
+                                         filter_shape=(num_lags, data.shape[-1]),
+                                         window_strides=(1, 1),
+                                         padding='VALID')
+    # The last window has no following emission to predict.
+    return x[0, :, :-1, 0].T
+
+
+def _predictive_means(weights, biases, design_matrix, compute_dtype=None):
+    """Multiply the design matrix against the weights of every state and add the biases."""
+    if compute_dtype is None:
+        return np.einsum('ti,kdi->tkd', design_matrix, weights) + biases
+
+    # Multiply in reduced precision but accumulate in full precision. The
+    # covariance solve in the log likelihoods stays in full precision.
+    mean = lax.dot_general(design_matrix.astype(compute_dtype),
+                           weights.astype(compute_dtype),
+                           dimension_numbers=(((1,), (2,)), ((), ())),
+                           preferred_element_type=weights.dtype)
+    return mean + biases
+
+
+@partial(jit, static_argnames=("compute_dtype",))
+def _autoregressive_log_likelihoods(weights, biases, scale_trils, data, compute_dtype=None):
+    """Log likelihood of each emission under each state, given the parameters as plain arrays.
+
+    Taking arrays rather than the emissions object means the compiled function is
+    reused across EM iterations whenever the shapes are unchanged.
+    """
+    num_states = weights.shape[0]
+    num_lags = weights.shape[-1] // data.shape[-1]
+    mean = _predictive_means(weights, biases, _lagged_windows(data, num_lags), compute_dtype)
+
+    # Compute the log probs. Ignore likelihood of the first bit of
+    # data since we don't have a prefix
+    log_probs = _batched_mvn_log_prob(data[num_lags:], mean, scale_trils)
+    return np.row_stack([np.zeros((num_lags, num_states)), log_probs])
+
+
 @register_pytree_node_class
 class AutoregressiveEmissions(Emissions):
     def __init__(self,
@@ -19,7 +94,9 @@ class AutoregressiveEmissions(Emissions):
                  biases: np.ndarray=None,
                  covariances: np.ndarray=None,
                  emissions_distribution: ssmd.GaussianLinearRegression=None,
-                 emissions_distribution_prior: ssmd.GaussianLinearRegressionPrior=None) -> None:
+                 emissions_distribution_prior: ssmd.GaussianLinearRegressionPrior=None,
+                 compute_dtype=None,
+                 m_step_batch_size: int=None) -> None:
         r"""Gaussian linear regression emissions class for Autoregressive HMM.
 
         Can be instantiated by specifying the parameters or you can pass in
@@ -40,6 +117,12 @@ class AutoregressiveEmissions(Emissions):
                 Defaults to None.
             emissions_distribution (ssmd.GaussianLinearRegression, optional): initialized emissions distribution. Defaults to None.
             emissions_distribution_prior (ssmd.MatrixNormalInverseWishart, optional): emissions prior distribution. Defaults to None.
+            compute_dtype (np.dtype, optional): reduced precision dtype (e.g. ``np.bfloat16``) in which to
+                multiply the data windows against the weights when computing predictive means.
+                Products are still accumulated in the dtype of the weights. Defaults to None (full precision).
+            m_step_batch_size (int, optional): default ``batch_size`` of :meth:`m_step`, so that the M-steps
+                run by ``fit`` accumulate their statistics over that many time series at a time.
+                Defaults to None, which processes the whole batch at once.
         """
 
         super(AutoregressiveEmissions, self).__init__(num_states)
@@ -66,6 +149,8 @@ class AutoregressiveEmissions(Emissions):
         # else:
         #     self._distribution_prior = emissions_distribution_prior
         self._prior = emissions_distribution_prior
+        self._compute_dtype = compute_dtype
+        self._m_step_batch_size = m_step_batch_size
 
     @property
     def emissions_shape(self):
@@ -85,53 +170,67 @@ class AutoregressiveEmissions(Emissions):
         return self._distribution[state].predict(history.ravel())
 
     def log_likelihoods_scan(self, data):
-        # Compute the emission log probs
-        dim = self._distribution.data_dimension
-        num_lags = self._distribution.covariate_dimension // dim
+        # Kept for backwards compatibility. The design matrix in ``log_likelihoods``
+        # computes the same quantity without scanning over time.
+        return self.log_likelihoods(data)
 
-        # Scan over the data
-        def _compute_ll(x, y):
-            ll = self._distribution.log_prob(y, covariates=x.ravel())
-            new_x = np.row_stack([x[1:], y])
-            return new_x, ll
-        _, log_probs = lax.scan(_compute_ll, np.zeros((num_lags, dim)), data)
+    def _design_matrix(self, data):
+        r"""Extract the flattened windows of preceding emissions used as regression covariates.
 
-        # Ignore likelihood of the first bit of data since we don't have a prefix
-        log_probs = log_probs.at[:num_lags].set(0.0)
-        return log_probs
+        Args:
+            data (np.ndarray): observed data
+                of shape :math:`(\text{num\_timesteps}, \text{emissions\_dim})`.
+
+        Returns:
+            x (np.ndarray): design matrix where ``x[t]`` is ``data[t:t + num_lags].ravel()``,
+                of shape :math:`(\text{num\_timesteps} - \text{num\_lags}, \text{num\_lags} * \text{emissions\_dim})`.
+        """
+        num_lags = self._distribution.covariate_dimension // data.shape[-1]
+        return _lagged_windows(data, num_lags)
 
     def log_likelihoods(self, data, covariates=None, metadata=None):
-        # Constants
-        num_timesteps, dim = data.shape
-        num_states = self.num_states
-        num_lags = self._distribution.covariate_dimension // dim
-
-        # Parameters
-        weights = self._distribution.weights
-        biases = self._distribution.bias
-        scale_trils = self._distribution.scale_tril
-
-        # Compute the predictive mean using a 2D convolution
-        # TODO: Do we have to flip the weights along the lags dimension?
-        mean = lax.conv(data.reshape(1, 1, num_timesteps, dim),
-                        weights.reshape(num_states * dim, 1, num_lags, dim),
-                        window_strides=(1, 1),
-                        padding='VALID')
-        mean = mean[0].reshape(num_states, dim, num_timesteps - num_lags + 1).transpose([2, 0, 1])
-        # The means are shifted by one so that mean[t] is really the mean of data[t+1].
-        mean = mean[:-1] + biases
-
-        # Compute the log probs. Ignore likelihood of the first bit of
-        # data since we don't have a prefix
-        log_probs = tfd.MultivariateNormalTriL(mean, scale_trils).log_prob(data[num_lags:, None, :])
-        log_probs = np.row_stack([np.zeros((num_lags, num_states)), log_probs])
-        return log_probs
+        return _autoregressive_log_likelihoods(self._distribution.weights,
+                                               self._distribution.bias,
+                                               self._distribution.scale_tril,
+                                               data,
+                                               compute_dtype=self._compute_dtype)
+
+    def _sufficient_statistics(self, dataset, expected_states):
+        r"""Sum the sufficient statistics of the linear regression over a batch of data.
+
+        Args:
+            dataset (np.ndarray): observed data
+                of shape :math:`(\text{batch\_dim}, \text{num\_timesteps}, \text{emissions\_dim})`.
+            expected_states (np.ndarray): posterior state probabilities
+                of shape :math:`(\text{batch\_dim}, \text{num\_timesteps}, \text{num\_states})`.
+
+        Returns:
+            stats (tuple): the summed sufficient statistics
+        """
+        num_lags = self._distribution.covariate_dimension // dataset.shape[-1]
+
+        # The covariates are the flattened windows of the preceding num_lags emissions.
+        x = vmap(self._design_matrix)(dataset)
+        y = dataset[:, num_lags:]
+        w = expected_states[:, num_lags:]
+
+        # Contract over the batch and time dimensions together so that only the
+        # summed statistics are materialized, not one set per time series.
+        counts = w.sum(axis=(0, 1))
+        return (counts,
+                np.einsum('btk,bti,btj->kij', w, x, x),
+                np.einsum('btk,bti->ki', w, x),
+                counts,
+                np.einsum('btk,bti,btj->kij', w, y, x),
+                np.einsum('btk,bti->ki', w, y),
+                np.einsum('btk,bti,btj->kij', w, y, y))
 
     def m_step(self,
                dataset: np.ndarray,
                posteriors: StationaryHMMPosterior,
                covariates=None,
-               metadata=None) -> AutoregressiveEmissions:
+               metadata=None,
+               batch_size: int=None) -> AutoregressiveEmissions:
         r"""Update the distribution with an M step.
 
         Operates over a batch of data.
@@ -141,52 +240,44 @@ class AutoregressiveEmissions(Emissions):
                 of shape :math:`(\text{batch\_dim}, \text{num\_timesteps}, \text{emissions\_dim})`.
             posteriors (StationaryHMMPosterior): HMM posterior object
                 with batch_dim to match dataset.
-                
+            batch_size (int, optional): if given, accumulate the statistics over
+                ``batch_size`` time series at a time to bound peak memory.
+                Defaults to None, which uses the ``m_step_batch_size`` given at construction.
+
         Returns:
             emissions (AutoregressiveEmissions): updated emissions object
         """
-        # TODO: Can we compute the expected sufficient statistics with a convolution or scan?
-
-        # weights are shape (num_states, dim, dim * lag)
-        num_states = self._distribution.weights.shape[0]
-        dim = self._distribution.weights.shape[1]
-        num_lags = self._distribution.weights.shape[2] // dim
-
-        # Collect statistics with a scan over data
-        def _collect_stats(carry, args):
-            x, stats = carry
-            y, w = args
-
-            new_x = np.row_stack([x[1:], y])
-            new_stats = \
-                tree_map(np.add, stats,
-                         tree_map(lambda s: np.einsum('k,...->k...', w, s),
-                                  ssmd.GaussianLinearRegression.sufficient_statistics(y, x.ravel())))
-            return (new_x, new_stats), None
-
-        # Initialize the stats to zero
-        init_stats = (np.zeros(num_states),
-                      np.zeros((num_states, num_lags * dim, num_lags * dim)),
-                      np.zeros((num_states, num_lags * dim)),
-                      np.zeros(num_states),
-                      np.zeros((num_states, dim, num_lags * dim)),
-                      np.zeros((num_states, dim)),
-                      np.zeros((num_states, dim, dim)))
-
-        # Scan over one time series
-        def scan_one(data, weights):
-            (_, stats), _ = lax.scan(_collect_stats,
-                                     (data[:num_lags], init_stats),
-                                     (data[num_lags:], weights[num_lags:]))
-            return stats
-
-        # vmap over all time series in dataset
-        stats = vmap(scan_one)(dataset, posteriors.expected_states)
-        stats = tree_map(partial(np.sum, axis=0), stats)
+        if batch_size is None:
+            batch_size = self._m_step_batch_size
+
+        expected_states = posteriors.expected_states
+        num_series = dataset.shape[0]
+        if batch_size is None or batch_size >= num_series:
+            stats = self._sufficient_statistics(dataset, expected_states)
+        else:
+            # Pad the batch to a whole number of chunks. The padded series have
+            # zero weight so they do not contribute to the statistics.
+            num_chunks = -(-num_series // batch_size)
+            pad = num_chunks * batch_size - num_series
+            chunk = lambda x: np.pad(x, [(0, pad)] + [(0, 0)] * (x.ndim - 1)).reshape(
+                num_chunks, batch_size, *x.shape[1:])
+
+            def _step(stats, args):
+                chunk_stats = self._sufficient_statistics(*args)
+                return tuple(s + c for s, c in zip(stats, chunk_stats)), None
+
+            args = (dataset, expected_states)
+            K = self.num_states
+            in_dim = self._distribution.covariate_dimension
+            out_dim = self._distribution.data_dimension
+            init_stats = tuple(np.zeros(shape, dtype=dataset.dtype) for shape in
+                               [(K,), (K, in_dim, in_dim), (K, in_dim),
+                                (K,), (K, out_dim, in_dim), (K, out_dim), (K, out_dim, out_dim)])
+            stats, _ = lax.scan(_step, init_stats, tree_map(chunk, args))
 
         # Add the prior stats and counts
         if self._prior is not None:
-            stats = tree_map(np.add, stats, self._prior.natural_parameters)
+            stats = tuple(s + p for s, p in zip(stats, self._prior.natural_parameters))
 
         # Compute the conditional distribution over parameters and take the mode
         conditional = ssmd.GaussianLinearRegression.compute_conditional_from_stats(stats)
@@ -195,12 +286,15 @@ class AutoregressiveEmissions(Emissions):
 
     def tree_flatten(self):
         children = (self._distribution, self._prior)
-        aux_data = self.num_states
+        aux_data = (self.num_states, self._compute_dtype, self._m_step_batch_size)
         return children, aux_data
 
     @classmethod
     def tree_unflatten(cls, aux_data, children):
+        num_states, compute_dtype, m_step_batch_size = aux_data
         distribution, prior = children
-        return cls(aux_data,
+        return cls(num_states,
                    emissions_distribution=distribution,
-                   emissions_distribution_prior=prior)
+                   emissions_distribution_prior=prior,
+                   compute_dtype=compute_dtype,
+                   m_step_batch_size=m_step_batch_size)
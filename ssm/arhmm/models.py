@@ -26,6 +26,8 @@ class GaussianARHMM(AutoregressiveHMM):
                  emission_weights: np.ndarray=None,
                  emission_biases: np.ndarray=None,
                  emission_covariances: np.ndarray=None,
+                 emission_compute_dtype=None,
+                 emission_m_step_batch_size: int=None,
                  seed: jr.PRNGKey=None):
         r"""Gaussian autoregressive hidden markov Model (ARHMM).
         
@@ -57,6 +59,11 @@ class GaussianARHMM(AutoregressiveHMM):
             emission_covariances (np.ndarray, optional): emission covariance ..math`Q_{z_t}`
                 with shape :math:`(\text{num\_states}, \text{emissions\_dim}, \text{emissions\_dim})`.
                 Defaults to None.
+            emission_compute_dtype (np.dtype, optional): reduced precision dtype (e.g. ``np.bfloat16``)
+                for the predictive mean computation. Defaults to None (full precision).
+            emission_m_step_batch_size (int, optional): number of time series over which the emissions
+                M-step accumulates its statistics at a time, to bound peak memory.
+                Defaults to None, which processes the whole batch at once.
             seed (jr.PRNGKey, optional): random seed. Defaults to None.
         """
 
@@ -95,7 +102,9 @@ class GaussianARHMM(AutoregressiveHMM):
         emissions = AutoregressiveEmissions(num_states,
                                             weights=emission_weights,
                                             biases=emission_biases,
-                                            covariances=emission_covariances)
+                                            covariances=emission_covariances,
+                                            compute_dtype=emission_compute_dtype,
+                                            m_step_batch_size=emission_m_step_batch_size)
         super(GaussianARHMM, self).__init__(num_states,
                                             initial_condition,
                                             transitions,
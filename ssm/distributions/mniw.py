@@ -21,10 +21,6 @@ class MatrixNormalInverseWishart(ConjugatePrior, tfd.JointDistributionNamed):
         self.df = df
         self.scale = scale_covariance
 
-        # Convert the inverse Wishart scale to the scale_tril of a Wishart.
-        # Note: this could be done more efficiently.
-        self.wishart_scale_tril = np.linalg.cholesky(np.linalg.inv(scale_covariance))
-
         super(MatrixNormalInverseWishart, self).__init__(dict(
             Sigma=lambda: tfd.TransformedDistribution(
                 tfd.WishartTriL(df, scale_tril=self.wishart_scale_tril),
@@ -38,6 +34,16 @@ class MatrixNormalInverseWishart(ConjugatePrior, tfd.JointDistributionNamed):
                 scale_column=tf.linalg.LinearOperatorFullMatrix(scale_column))
         ))
 
+    @property
+    def wishart_scale_tril(self):
+        """The scale_tril of the Wishart distribution on the precision.
+
+        Computed on demand, since fitting only needs the mode and shouldn't pay
+        for an extra inverse and Cholesky factorization of the scale each M-step.
+        """
+        # Note: this could be done more efficiently.
+        return np.linalg.cholesky(np.linalg.inv(self.scale))
+
     def __repr__(self) -> str:
         return "<MatrixNormalInverseWishart batch_shape={} event_shape={}>".\
             format(self.loc.shape[:-2], self.loc.shape[-2:])
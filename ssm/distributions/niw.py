@@ -25,10 +25,6 @@ class NormalInverseWishart(ConjugatePrior, tfd.JointDistributionNamed):
         self.df = df
         self.scale = scale
 
-        # Convert the inverse Wishart scale to the scale_tril of a Wishart.
-        # Note: this could be done more efficiently.
-        self.wishart_scale_tril = np.linalg.cholesky(np.linalg.inv(scale))
-
         super(NormalInverseWishart, self).__init__(dict(
             Sigma=lambda: tfd.TransformedDistribution(
                 tfd.WishartTriL(df, scale_tril=self.wishart_scale_tril),
@@ -40,6 +36,14 @@ class NormalInverseWishart(ConjugatePrior, tfd.JointDistributionNamed):
                 loc, Sigma / mean_precision)
         ))
 
+    @property
+    def wishart_scale_tril(self):
+        """Convert the inverse Wishart scale to the scale_tril of a Wishart.
+        This is only needed for sampling and log probs, not for the mode.
+        """
+        # Note: this could be done more efficiently.
+        return np.linalg.cholesky(np.linalg.inv(self.scale))
+
     # These functions compute the pseudo-observations implied by the NIW prior
     # and convert sufficient statistics to a NIW posterior. We'll describe them
     # in more detail below.
@@ -9,7 +9,7 @@ from jax.tree_util import register_pytree_node_class
 
 from ssm.base import SSM
 from ssm.inference.em import em
-from ssm.utils import Verbosity, auto_batch, one_hot, ensure_has_batch_dim
+from ssm.utils import Verbosity, auto_batch, one_hot, ensure_has_batch_dim, kmeans
 
 import ssm.hmm.initial as initial
 import ssm.hmm.transitions as transitions
@@ -113,11 +113,11 @@ class HMM(SSM):
             assignments = jr.choice(key, self._num_states, data.shape[:-1])
 
         elif method.lower() == "kmeans":
-            from sklearn.cluster import KMeans
-            km = KMeans(num_states)
             # TODO: use self.emissions_shape
+            key = jr.PRNGKey(0) if key is None else key
             flat_dataset = data.reshape(-1, data.shape[-1])
-            assignments = km.fit_predict(flat_dataset).reshape(data.shape[:-1])
+            assignments, _ = kmeans(key, flat_dataset, num_states)
+            assignments = assignments.reshape(data.shape[:-1])
 
         else:
             raise ValueError(f"Invalid initialize method: {method}.")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 import jax.numpy as np
-from jax import vmap
+from jax import jit, vmap
 from jax.tree_util import register_pytree_node_class, tree_flatten, tree_unflatten
 from jax.flatten_util import ravel_pytree
 import jax.scipy.optimize
@@ -10,6 +10,16 @@ import ssm.distributions as ssmd
 tfd = tfp.distributions
 
 
+@jit
+def _exponential_family_log_likelihoods(distribution, data):
+    """Evaluate a distribution with batch shape (num_states,) at every data point.
+
+    Taking the distribution rather than the emissions object means the compiled
+    function is reused across EM iterations whenever the shapes are unchanged.
+    """
+    event_ndims = len(distribution.event_shape)
+    return distribution.log_prob(np.expand_dims(data, axis=-event_ndims - 1))
+
 
 class Emissions:
     """
@@ -142,6 +152,15 @@ class ExponentialFamilyEmissions(Emissions):
         """
         return self._distribution[state]
 
+    def log_likelihoods(self, data, covariates=None, metadata=None):
+        """
+        Compute log p(x_t | z_t=k) for all t and k.
+
+        The emissions distribution has batch shape (num_states,), so we evaluate
+        all states at once by broadcasting the data against it.
+        """
+        return _exponential_family_log_likelihoods(self._distribution, data)
+
     def m_step(self, dataset, posteriors, covariates=None, metadata=None) -> ExponentialFamilyEmissions:
         """Update the emissions distribution using an M-step.
 
@@ -81,21 +81,32 @@ class StandardInitialCondition(InitialCondition):
             self._distribution = initial_distribution
         num_states = self._distribution.probs_parameter().shape[-1]
 
+        # Only the concentration of the Dirichlet prior is needed for the M-step,
+        # so store it as an array rather than carrying the distribution around.
         if initial_distribution_prior is None:
-            initial_distribution_prior = ssmd.Dirichlet(1.1 * np.ones(num_states))
-        self._distribution_prior = initial_distribution_prior
+            self._prior_concentration = 1.1 * np.ones(num_states)
+        else:
+            self._prior_concentration = initial_distribution_prior.concentration
+
+        # Cache the normalized log probabilities so inference doesn't recompute them
+        self._log_initial_probs = self._compute_log_initial_probs()
 
     def tree_flatten(self):
-        children = (self._distribution, self._distribution_prior)
+        children = (self._distribution, self._prior_concentration, self._log_initial_probs)
         aux_data = self.num_states
         return children, aux_data
 
     @classmethod
     def tree_unflatten(cls, aux_data, children):
-        distribution, prior = children
-        return cls(aux_data,
-                   initial_distribution=distribution,
-                   initial_distribution_prior=prior)
+        # Bypass the constructor so that the cached log probabilities are reused.
+        obj = object.__new__(cls)
+        InitialCondition.__init__(obj, aux_data)
+        obj._distribution, obj._prior_concentration, obj._log_initial_probs = children
+        return obj
+
+    def _compute_log_initial_probs(self):
+        lps = self._distribution.logits_parameter()
+        return lps - spsp.logsumexp(lps)
 
     def distribution(self, covariates=None, metadata=None):
        return self._distribution
@@ -104,8 +115,7 @@ class StandardInitialCondition(InitialCondition):
         """
         Return [log Pr(z_1 = k) for k in range(num_states)]
         """
-        lps = self._distribution.logits_parameter()
-        return lps - spsp.logsumexp(lps)
+        return self._log_initial_probs
 
     def m_step(self, dataset, posteriors, covariates=None, metadata=None) -> StandardInitialCondition:
         """Update the initial distribution in an M step given posteriors over the latent states.
@@ -124,7 +134,9 @@ class StandardInitialCondition(InitialCondition):
             initial_condition (StandardInitialCondition): updated initial condition object
         """
         stats = np.sum(posteriors.expected_initial_states, axis=0)
-        stats += self._distribution_prior.concentration
+        stats += self._prior_concentration
         conditional = ssmd.Categorical.compute_conditional_from_stats(stats)
         self._distribution = ssmd.Categorical.from_params(conditional.mode())
+        # The mode of the Dirichlet is already normalized, so its log needs no further logsumexp.
+        self._log_initial_probs = self._distribution.logits
         return self
@@ -105,23 +105,33 @@ class StationaryTransitions(Transitions):
         else:
             self._distribution = transition_distribution
 
+        # Only the concentration of the Dirichlet prior is needed for the M-step,
+        # so store it as an array rather than carrying the distribution around.
         if transition_distribution_prior is None:
             num_states = self._distribution.probs_parameter().shape[-1]
-            transition_distribution_prior = \
-                ssmd.Dirichlet(1.1 * np.ones((num_states, num_states)))
-        self._prior = transition_distribution_prior
+            self._prior_concentration = 1.1 * np.ones((num_states, num_states))
+        else:
+            self._prior_concentration = transition_distribution_prior.concentration
+
+        # Cache the normalized log transition matrix so inference doesn't recompute it
+        self._log_transition_matrix = self._compute_log_transition_matrix()
 
     def tree_flatten(self):
-        children = (self._distribution, self._prior)
+        children = (self._distribution, self._prior_concentration, self._log_transition_matrix)
         aux_data = self.num_states
         return children, aux_data
 
     @classmethod
     def tree_unflatten(cls, aux_data, children):
-        distribution, prior = children
-        return cls(aux_data,
-                   transition_distribution=distribution,
-                   transition_distribution_prior=prior)
+        # Bypass the constructor so that the cached log transition matrix is reused.
+        obj = object.__new__(cls)
+        Transitions.__init__(obj, aux_data)
+        obj._distribution, obj._prior_concentration, obj._log_transition_matrix = children
+        return obj
+
+    def _compute_log_transition_matrix(self):
+        log_P = self._distribution.logits_parameter()
+        return log_P - spsp.logsumexp(log_P, axis=1, keepdims=True)
 
     @property
     def transition_matrix(self):
@@ -131,15 +141,16 @@ class StationaryTransitions(Transitions):
         return self._distribution[state]
 
     def log_transition_matrices(self, data, covariates=None, metadata=None):
-        log_P = self._distribution.logits_parameter()
-        log_P -= spsp.logsumexp(log_P, axis=1, keepdims=True)
-        return log_P
+        return self._log_transition_matrix
 
     def m_step(self, dataset, posteriors, covariates=None, metadata=None) -> StationaryTransitions:
         stats = np.sum(posteriors.expected_transitions, axis=0)
-        stats += self._prior.concentration
+        stats += self._prior_concentration
         conditional = ssmd.Categorical.compute_conditional_from_stats(stats)
         self._distribution = ssmd.Categorical.from_params(conditional.mode())
+        # The mode of the Dirichlet is already normalized, so its log is the
+        # log transition matrix and needs no further logsumexp.
+        self._log_transition_matrix = self._distribution.logits
         return self
 
 
@@ -7,6 +7,19 @@ from jax import jit, vmap
 from ssm.utils import Verbosity, ensure_has_batch_dim, ssm_pbar
 
 
+@jit
+def _em_step(model, data, covariates=None, metadata=None):
+    """One iteration of EM.
+
+    Defined at module level (rather than as a closure over the data inside ``em``)
+    so that the compiled step is reused across calls to ``em`` with the same shapes.
+    """
+    posterior = model.e_step(data, covariates=covariates, metadata=metadata)
+    lp = model.marginal_likelihood(data, posterior, covariates=covariates, metadata=metadata).sum()
+    model = model.m_step(data, posterior, covariates=covariates, metadata=metadata)
+    return model, posterior, lp
+
+
 @ensure_has_batch_dim(model_arg="model")
 def em(model,
        data,
@@ -41,13 +54,6 @@ def em(model,
         posterior: the posterior over the inferred latent states
     """
 
-    @jit
-    def update(model):
-        posterior = model.e_step(data, covariates=covariates, metadata=metadata)
-        lp = model.marginal_likelihood(data, posterior, covariates=covariates, metadata=metadata).sum()
-        model = model.m_step(data, posterior, covariates=covariates, metadata=metadata)
-        return model, posterior, lp
-
     # Run the EM algorithm to convergence
     log_probs = []
     pbar = ssm_pbar(num_iters, verbosity, "Iter {} LP: {:.3f}", 0, np.nan)
@@ -56,7 +62,7 @@ def em(model,
         pbar.set_description("[jit compiling...]")
 
     for itr in pbar:
-        model, posterior, lp = update(model)
+        model, posterior, lp = _em_step(model, data, covariates, metadata)
         assert np.isfinite(lp), "NaNs in marginal log probability"
 
         log_probs.append(lp)
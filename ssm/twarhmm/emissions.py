@@ -1,7 +1,6 @@
 from __future__ import annotations
-from functools import partial
 import jax.numpy as np
-from jax.tree_util import tree_map, register_pytree_node_class
+from jax.tree_util import register_pytree_node_class
 from jax import vmap
 
 from tensorflow_probability.substrates import jax as tfp
@@ -152,33 +151,21 @@ class TimeWarpedAutoregressiveEmissions(FactorialEmissions):
         Returns:
             emissions (TimeWarpedAutoregressiveEmissions): updated emissions object
         """
-        # Collect statistics for a single time step
-        def _suff_stats_single(expected_states, dx, x):
-            # compute sufficient statistics for each time constant
-            # f = lambda tau: GaussianLinearRegression.sufficient_statistics(tau * dx, x)
-            # stats = vmap(f)(self.time_constants)
-            tw_sufficient_stats = lambda tau: \
-                (1.0,
-                 1 / tau * np.outer(x, x),
-                 1 / tau * x,
-                 1 / tau,
-                 np.outer(dx, x),
-                 dx,
-                 tau * np.outer(dx, dx))
-            stats = vmap(tw_sufficient_stats)(self.time_constants)
-
-            # compute the expected sufficient statistics by summing over time constants
-            # weighted by Pr(z=k, tau=c) for each discrete state k
-            return tree_map(lambda s: np.einsum('kc,c...->k...', expected_states, s), stats)
-
-        # Collect the sum of statistics for a single trial
-        def _sum_stats_single(data, posterior):
-            stats = vmap(_suff_stats_single)(posterior.expected_states[1:],
-                                             np.diff(data, axis=0), data[:-1])
-            return tree_map(partial(np.sum, axis=0), stats)
-
-        # Sum over trials
-        stats = tree_map(partial(np.sum, axis=0), vmap(_sum_stats_single)(dataset, posteriors))
+        # The expected statistics are sums over trials, time steps, and time constants,
+        # weighted by Pr(z_t=k, tau_t=c). Contract all of them at once so that only the
+        # summed statistics are materialized, not one set per time step.
+        expected_states = posteriors.expected_states[:, 1:]
+        dx = np.diff(dataset, axis=1)
+        x = dataset[:, :-1]
+        inv_taus = 1 / self.time_constants
+
+        stats = (np.einsum('btkc->k', expected_states),
+                 np.einsum('btkc,c,bti,btj->kij', expected_states, inv_taus, x, x),
+                 np.einsum('btkc,c,bti->ki', expected_states, inv_taus, x),
+                 np.einsum('btkc,c->k', expected_states, inv_taus),
+                 np.einsum('btkc,bti,btj->kij', expected_states, dx, x),
+                 np.einsum('btkc,bti->ki', expected_states, dx),
+                 np.einsum('btkc,c,bti,btj->kij', expected_states, self.time_constants, dx, dx))
 
         # Compute the conditional distribution over parameters and take the mode
         conditional = GaussianLinearRegression.compute_conditional_from_stats(stats)
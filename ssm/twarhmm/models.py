@@ -17,7 +17,7 @@ from ssm.factorial_hmm.initial import FactorialInitialCondition
 from ssm.factorial_hmm.transitions import FactorialTransitions
 from ssm.hmm.transitions import StationaryTransitions, SimpleStickyTransitions
 from ssm.twarhmm.emissions import TimeWarpedAutoregressiveEmissions
-from ssm.utils import ensure_has_batch_dim
+from ssm.utils import ensure_has_batch_dim, kmeans
 
 
 @register_pytree_node_class
@@ -184,11 +184,10 @@ class GaussianTWARHMM(FactorialHMM, AutoregressiveHMM):
         # initialize assignments and perform one M-step
         if method.lower() == "kmeans":
             # cluster the data with kmeans
-            # print("initializing with kmeans")
-            from sklearn.cluster import KMeans
-            km = KMeans(self.num_discrete_states)
+            key = jr.PRNGKey(0) if key is None else key
             flat_dataset = data.reshape(num_batches * num_timesteps, -1)
-            assignments = km.fit_predict(flat_dataset).reshape(num_batches, num_timesteps)
+            assignments, _ = kmeans(key, flat_dataset, self.num_discrete_states)
+            assignments = assignments.reshape(num_batches, num_timesteps)
 
         else:
             raise ValueError(f"Invalid initialize method: {method}.")
@@ -2,18 +2,21 @@
 Useful utility functions.
 """
 
+import numpy as onp
 import jax.numpy as np
 import jax.random as jr
 import jax.scipy.special as spsp
-from jax import vmap, lax
-from jax.tree_util import tree_map, tree_structure, tree_leaves, tree_reduce
+from jax import jit, vmap, lax
+from jax.core import Tracer
+from jax.tree_util import tree_map, tree_structure, tree_leaves, tree_reduce, tree_flatten
 
 import inspect
+import math
 from enum import IntEnum
 from tqdm.auto import trange
 from scipy.optimize import linear_sum_assignment
 from typing import Sequence, Optional
-from functools import wraps, partial
+from functools import wraps, partial, lru_cache
 import copy
 
 
@@ -95,6 +98,18 @@ def ssm_pbar(num_iters, verbose, description, *args):
     return pbar
 
 
+@partial(jit, static_argnames=("K1", "K2"))
+def _state_overlap(z1, z2, K1, K2):
+    # Count each co-occurring pair of states with a single bincount (a scatter-add)
+    # over the flattened pair index rather than comparing every time step against
+    # every pair of states.
+    # Pairs with a state outside of the given bounds are sent to an extra bin that
+    # is dropped, so that they are ignored rather than counted in the wrong cell.
+    z1, z2 = z1.astype(np.int32), z2.astype(np.int32)
+    flat_idx = np.where((z1 < K1) & (z2 < K2), z1 * K2 + z2, K1 * K2)
+    return np.bincount(flat_idx, length=K1 * K2 + 1)[:-1].reshape(K1, K2)
+
+
 def compute_state_overlap(
     z1: Sequence[int],
     z2: Sequence[int],
@@ -116,20 +131,58 @@ def compute_state_overlap(
     Returns:
         overlap matrix: Matrix of cumulative overlap events.
     """
-    assert z1.dtype == "int32" and z2.dtype == "int32"
+    assert np.issubdtype(z1.dtype, np.integer) and np.issubdtype(z2.dtype, np.integer)
+    assert z1.shape == z2.shape
+    assert z1.min() >= 0 and z2.min() >= 0
+
+    K1 = int(z1.max()) + 1 if K1 is None else K1
+    K2 = int(z2.max()) + 1 if K2 is None else K2
+
+    # The number of states is static, so repeated calls with the same K1 and K2
+    # (e.g. across a sweep of trials) reuse one compiled kernel.
+    return _state_overlap(z1, z2, int(K1), int(K2))
+
+
+def _compute_state_overlap_numpy(z1, z2, K1=None, K2=None):
+    """
+    Host-side version of :func:`compute_state_overlap` for use with SciPy routines.
+    """
+    z1, z2 = onp.asarray(z1), onp.asarray(z2)
+    assert onp.issubdtype(z1.dtype, onp.integer) and onp.issubdtype(z2.dtype, onp.integer)
     assert z1.shape == z2.shape
     assert z1.min() >= 0 and z2.min() >= 0
 
     K1 = z1.max() + 1 if K1 is None else K1
     K2 = z2.max() + 1 if K2 is None else K2
 
-    overlap = np.sum(
-        (z1[:, None] == np.arange(K1))[:, :, None]
-        & (z2[:, None] == np.arange(K2))[:, None, :],
-        axis=0,
-    )
-    assert overlap.shape == (K1, K2)
-    return overlap
+    in_bounds = (z1 < K1) & (z2 < K2)
+    flat_idx = z1[in_bounds] * K2 + z2[in_bounds]
+    return onp.bincount(flat_idx, minlength=K1 * K2).reshape(K1, K2)
+
+
+def _max_overlap_assignment(overlap):
+    """Solve the assignment problem that maximizes the total overlap.
+
+    Rows and columns without any overlap (e.g. states that are never used)
+    contribute nothing however they are matched, so the dense solver only runs
+    on the block of rows and columns with nonzero overlap. The remaining rows are
+    then matched to the remaining columns in order.
+    """
+    K1, K2 = overlap.shape
+    rows = onp.flatnonzero(overlap.any(axis=1))
+    cols = onp.flatnonzero(overlap.any(axis=0))
+    if K1 > K2 or (len(rows) == K1 and len(cols) == K2):
+        return linear_sum_assignment(-overlap)
+
+    perm = onp.full(K1, -1)
+    sub_rows, sub_cols = linear_sum_assignment(-overlap[onp.ix_(rows, cols)])
+    perm[rows[sub_rows]] = cols[sub_cols]
+
+    # Match the rest of the rows to the unused columns, which all have zero overlap.
+    unmatched = onp.flatnonzero(perm < 0)
+    unused = onp.setdiff1d(onp.arange(K2), perm[perm >= 0], assume_unique=True)
+    perm[unmatched] = unused[:len(unmatched)]
+    return onp.arange(K1), perm
 
 
 def find_permutation(
@@ -152,16 +205,18 @@ def find_permutation(
     Returns:
         overlap matrix: Matrix of cumulative overlap events.
     """
-    overlap = compute_state_overlap(z1, z2, K1=K1, K2=K2)
+    # The assignment is solved on the host, so compute the overlap there too
+    # rather than transferring it off the device.
+    overlap = _compute_state_overlap_numpy(z1, z2, K1=K1, K2=K2)
     K1, K2 = overlap.shape
 
-    tmp, perm = linear_sum_assignment(-overlap)
-    assert np.all(tmp == np.arange(K1)), "All indices should have been matched!"
+    tmp, perm = _max_overlap_assignment(overlap)
+    assert onp.array_equal(tmp, onp.arange(K1)), "All indices should have been matched!"
 
     # Pad permutation if K1 < K2
     if K1 < K2:
-        unused = np.array(list(set(np.arange(K2)) - set(perm)))
-        perm = np.concatenate((perm, unused))
+        unused = onp.setdiff1d(onp.arange(K2), perm, assume_unique=True)
+        perm = onp.concatenate((perm, unused))
 
     return perm
 
@@ -175,6 +230,9 @@ def random_rotation(seed, n, theta=None):
         theta (float, optional): If specified, this is the angle of the rotation, otherwise
             a random angle sampled from a standard Gaussian scaled by ::math::`\pi / 2`. Defaults to None.
 
+    Concrete inputs are handled with NumPy on the host. Traced inputs (e.g. under
+    ``jit`` or ``vmap`` over the seed) fall back to the equivalent JAX computation.
+
     Returns:
         [type]: [description]
     """
@@ -188,11 +246,65 @@ def random_rotation(seed, n, theta=None):
     if n == 1:
         return jr.uniform(key1) * np.eye(1)
 
-    rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
-    out = np.eye(n)
-    out = out.at[:2, :2].set(rot)
-    q = np.linalg.qr(jr.uniform(key2, shape=(n, n)))[0]
-    return q.dot(out).dot(q.T)
+    u = jr.uniform(key2, shape=(n, n))
+
+    # Under jit or vmap the inputs are tracers, so stay in JAX.
+    if isinstance(seed, Tracer) or isinstance(theta, Tracer):
+        rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+        out = np.eye(n, dtype=u.dtype)
+        out = out.at[:2, :2].set(rot)
+        q = np.linalg.qr(u)[0]
+        return q.dot(out).dot(q.T)
+
+    # Otherwise this is a one-off setup computation on a small matrix, so do the
+    # linear algebra with NumPy on the host rather than compiling it with XLA. The
+    # random draws still come from the JAX key so that results are reproducible.
+    theta = float(theta)
+    rot = onp.array([[onp.cos(theta), -onp.sin(theta)], [onp.sin(theta), onp.cos(theta)]])
+    out = onp.eye(n, dtype=u.dtype)
+    out[:2, :2] = rot
+    q = onp.linalg.qr(onp.asarray(u))[0]
+    return np.asarray(q @ out @ q.T)
+
+
+def _argument_lookup(sig, name):
+    """Return a function that gets the value of argument ``name`` from ``(args, kwargs)``.
+
+    Resolving the position of the argument once up front avoids binding the full
+    signature on every call of a decorated function.
+    """
+    index = list(sig.parameters).index(name)
+    default = sig.parameters[name].default
+    default = None if default is inspect.Parameter.empty else default
+
+    def lookup(args, kwargs):
+        if name in kwargs:
+            return kwargs[name]
+        return args[index] if index < len(args) else default
+    return lookup
+
+
+def _all_leaves_match(cache, leaf_fn, data, emissions_shape):
+    """Check ``leaf_fn(leaf_shape, emissions_shape)`` for every leaf of the data.
+
+    The result only depends on the shapes, so it is memoized in ``cache`` on the
+    tree structure and leaf shapes of the data along with the emissions shape.
+    """
+    leaves, treedef = tree_flatten(data)
+    key = (treedef, tuple(leaf.shape for leaf in leaves), emissions_shape)
+    try:
+        return cache[key]
+    except TypeError:
+        # The emissions shape is not hashable, so skip the cache
+        key = None
+    except KeyError:
+        pass
+
+    given_shape = tree_map(lambda x: np.array(x.shape), data)
+    result = all(tree_leaves(tree_map(leaf_fn, given_shape, emissions_shape)))
+    if key is not None:
+        cache[key] = result
+    return result
 
 
 def ensure_has_batch_dim(batched_args=("data", "posterior", "covariates", "metadata"),
@@ -217,21 +329,24 @@ def ensure_has_batch_dim(batched_args=("data", "posterior", "covariates", "metad
     def ensure_has_batch_dim_decorator(f):
         sig = inspect.signature(f)
 
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            bound_args = sig.bind(*args, **kwargs)
-            bound_args.apply_defaults()
+        assert "data" in batched_args and "data" in sig.parameters,\
+            "`data` must be an argument in order to use the `ensure_has_batch_dim` decorator."
 
-            assert "data" in batched_args and "data" in bound_args.arguments,\
-                "`data` must be an argument in order to use the `ensure_has_batch_dim` decorator."
+        assert model_arg in sig.parameters, \
+            "`model_arg` must be an argument in order to use the `ensure_has_batch_dim` decorator."
 
-            assert model_arg in bound_args.arguments, \
-                "`model_arg` must be an argument in order to use the `ensure_has_batch_dim` decorator."
+        get_data = _argument_lookup(sig, "data")
+        get_model = _argument_lookup(sig, model_arg)
+        params = list(sig.parameters)
+        batched_indices = {key: params.index(key) for key in batched_args if key in sig.parameters}
+        needs_batch_cache = {}
 
+        @wraps(f)
+        def wrapper(*args, **kwargs):
             # Determine the batch dimension from the shape of the data and the model.
             # Naively assume that if data needs a batch, so do the other batched args.
-            given_shape = tree_map(lambda x: np.array(x.shape), bound_args.arguments["data"])
-            emissions_shape = bound_args.arguments[model_arg].emissions_shape
+            data = get_data(args, kwargs)
+            emissions_shape = get_model(args, kwargs).emissions_shape
 
             # First check that the trailing shapes are correct.
             # leaf_is_valid = lambda shp, shp_suffix: \
@@ -242,16 +357,19 @@ def ensure_has_batch_dim(batched_args=("data", "posterior", "covariates", "metad
 
             # A leaf needs a batch dim if it only has one extra dimension (num_timesteps).
             leaf_needs_batch = lambda shp, shp_suffix: len(shp) == len(shp_suffix) + 1
-            needs_batch = all(tree_leaves(tree_map(leaf_needs_batch, given_shape, emissions_shape)))
+            needs_batch = _all_leaves_match(needs_batch_cache, leaf_needs_batch, data, emissions_shape)
 
-            # If data needs a batch, assume the other args do too
+            # If data needs a batch, assume the other args do too.
+            # Update them in place in args or kwargs, wherever they were given.
             if needs_batch:
-                for key in batched_args:
-                    if key in bound_args.arguments and bound_args.arguments[key] is not None:
-                        bound_args.arguments[key] = \
-                            tree_map(lambda x: x[None, ...], bound_args.arguments[key])
+                args = list(args)
+                for key, index in batched_indices.items():
+                    if key in kwargs:
+                        kwargs[key] = tree_map(lambda x: x[None, ...], kwargs[key])
+                    elif index < len(args) and args[index] is not None:
+                        args[index] = tree_map(lambda x: x[None, ...], args[index])
 
-            return f(**bound_args.arguments)
+            return f(*args, **kwargs)
 
         return wrapper
     return ensure_has_batch_dim_decorator
@@ -285,21 +403,22 @@ def auto_batch(batched_args=("data", "posterior", "covariates", "metadata", "sta
     def auto_batch_decorator(f):
         sig = inspect.signature(f)
 
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            bound_args = sig.bind(*args, **kwargs)
-            bound_args.apply_defaults()
+        assert "data" in batched_args and "data" in sig.parameters,\
+            "`data` must be an argument in order to use the `auto_batch` decorator."
 
-            assert "data" in batched_args and "data" in bound_args.arguments,\
-                "`data` must be an argument in order to use the `auto_batch` decorator."
+        assert model_arg in sig.parameters, \
+            "`model_arg` must be an argument in order to use the `auto_batch` decorator."
 
-            assert model_arg in bound_args.arguments, \
-                "`model_arg` must be an argument in order to use the `auto_batch` decorator."
+        get_data = _argument_lookup(sig, "data")
+        get_model = _argument_lookup(sig, model_arg)
+        is_batched_cache = {}
 
+        @wraps(f)
+        def wrapper(*args, **kwargs):
             # Determine the batch dimension from the shape of the data and the model.
             # Naively assume that if data is batched, so are the other batched args.
-            given_shape = tree_map(lambda x: np.array(x.shape), bound_args.arguments["data"])
-            emissions_shape = bound_args.arguments[model_arg].emissions_shape
+            data = get_data(args, kwargs)
+            emissions_shape = get_model(args, kwargs).emissions_shape
 
             # First check that the trailing shapes are correct.
             # leaf_is_valid = lambda shp, shp_suffix: \
@@ -310,13 +429,16 @@ def auto_batch(batched_args=("data", "posterior", "covariates", "metadata", "sta
 
             # Assume a leaf is batched if it has two extra dimensions (batch and num_timesteps).
             leaf_is_batched = lambda shp, shp_suffix: len(shp) == len(shp_suffix) + 2
-            is_batched = all(tree_leaves(tree_map(leaf_is_batched, given_shape, emissions_shape)))
+            is_batched = _all_leaves_match(is_batched_cache, leaf_is_batched, data, emissions_shape)
 
             if not is_batched:
                 return f(*args, **kwargs)
 
             else:
                 # Otherwise, separate out the fixed args from those with a batch dimension and call vmap.
+                # Only this path needs the full set of bound arguments.
+                bound_args = sig.bind(*args, **kwargs)
+                bound_args.apply_defaults()
                 fixed_kwargs, batch_kwargs = {}, {}
                 for arg, val in bound_args.arguments.items():
                     if arg in batched_args:
@@ -330,15 +452,71 @@ def auto_batch(batched_args=("data", "posterior", "covariates", "metadata", "sta
 
 
 
+@partial(jit, static_argnums=(2, 3))
+def kmeans(key, data, num_clusters, num_iters=20):
+    """Cluster data with k-means (Lloyd's algorithm), seeded with k-means++.
+
+    Runs entirely on device so that it can be used to initialize models
+    without round tripping the data through host memory.
+
+    Args:
+        key (jr.PRNGKey): random seed used for the k-means++ seeding.
+        data (np.ndarray): array of points of shape ``(N, D)``.
+        num_clusters (int): number of clusters ``K``.
+        num_iters (int, optional): number of Lloyd iterations. Defaults to 20.
+
+    Returns:
+        assignments (np.ndarray): cluster index of each point, of shape ``(N,)``.
+        centroids (np.ndarray): cluster centers, of shape ``(K, D)``.
+    """
+    data = np.asarray(data, dtype=float)
+    num_points = data.shape[0]
+    sq_norms = np.sum(data ** 2, axis=1)
+
+    def _sq_dists(centroids):
+        # Matmul form of ||x - c||^2 so the (N, K) distances are one GEMM
+        return sq_norms[:, None] - 2 * data @ centroids.T + np.sum(centroids ** 2, axis=1)
+
+    # Greedy k-means++: draw a few candidates for each new center with probability
+    # proportional to their squared distance from the nearest center chosen so far,
+    # and keep the candidate that most reduces the total squared distance.
+    num_candidates = 2 + int(math.log(num_clusters))
+    keys = jr.split(key, num_clusters)
+    first = data[jr.choice(keys[0], num_points)]
+    centroids = np.tile(first, (num_clusters, 1))
+
+    def _seed(k, centroids):
+        min_sq_dists = np.maximum(np.min(_sq_dists(centroids), axis=1), 0)
+        candidates = jr.categorical(keys[k], np.log(min_sq_dists), shape=(num_candidates,))
+        potentials = np.minimum(min_sq_dists[:, None], _sq_dists(data[candidates])).sum(axis=0)
+        return centroids.at[k].set(data[candidates[np.argmin(potentials)]])
+
+    centroids = lax.fori_loop(1, num_clusters, _seed, centroids)
+
+    def _assign(centroids):
+        return np.argmin(_sq_dists(centroids), axis=1)
+
+    def _lloyd(_, centroids):
+        resp = (_assign(centroids)[:, None] == np.arange(num_clusters)).astype(data.dtype)
+        counts = resp.sum(axis=0)
+        means = (resp.T @ data) / np.maximum(counts, 1)[:, None]
+        # Leave the centers of empty clusters where they are
+        return np.where(counts[:, None] > 0, means, centroids)
+
+    centroids = lax.fori_loop(0, num_iters, _lloyd, centroids)
+    return _assign(centroids), centroids
+
+
+@lru_cache(maxsize=32)
+def _arange_cached(K):
+    # A host-side NumPy array, so it is safe to reuse across traces.
+    return onp.arange(K)
+
+
 def one_hot(z, K):
-    z = np.atleast_1d(z).astype(int)
+    z = np.asarray(z)
     assert np.all(z >= 0) and np.all(z < K)
-    shp = z.shape
-    N = z.size
-    zoh = np.zeros((N, K))
-    zoh = zoh.at[np.arange(N), np.arange(K)[np.ravel(z)]].set(1)
-    zoh = np.reshape(zoh, shp + (K,))
-    return zoh
+    return (z[..., None] == _arange_cached(K)).astype(np.float32)
 
 
 def logspace_tensordot(tensor, matrix, axis):
@@ -353,9 +531,11 @@ def logspace_tensordot(tensor, matrix, axis):
     -------
     result : (..., n, ...)-array
     """
-    tensor = np.moveaxis(tensor, axis, -1)
-    tensor = spsp.logsumexp(tensor[..., None] + matrix, axis=-2)
-    return np.moveaxis(tensor, -1, axis)
+    # Broadcast the matrix against the tensor along ``axis`` and reduce there,
+    # so that neither the input nor the result needs to be transposed.
+    axis = axis % tensor.ndim
+    matrix = matrix.reshape(matrix.shape + (1,) * (tensor.ndim - axis - 1))
+    return spsp.logsumexp(np.expand_dims(tensor, axis + 1) + matrix, axis=axis)
 
 
 #### FUNCTIONS FOR DEBUGGING ####
@@ -410,10 +590,11 @@ def check_pytree_structure_match(obj_a, obj_b, mode="input", sig=None):
     idxs = test_and_find_inequality(
         struct_a.children(), struct_b.children(), check_name="PyTreeDef Structure", mode=mode, sig=sig
     )
+    leaves_a, leaves_b = tree_leaves(obj_a), tree_leaves(obj_b)
     for i in idxs:
         print(f"{CRED}[{mode} pytree structure [{i}]]")
-        print("prev=", repr(tree_leaves(obj_a)[i]))
-        print("curr=", repr(tree_leaves(obj_b)[i]), CEND)
+        print("prev=", repr(leaves_a[i]))
+        print("curr=", repr(leaves_b[i]), CEND)
 
 
 def check_pytree_shape_match(obj_a, obj_b, mode="input", sig=None):
@@ -431,10 +612,11 @@ def check_pytree_shape_match(obj_a, obj_b, mode="input", sig=None):
     idxs = test_and_find_inequality(
         shape_a, shape_b, check_name="PyTree Leaf Shape", mode=mode, sig=None
     )
+    leaves_a, leaves_b = tree_leaves(obj_a), tree_leaves(obj_b)
     for i in idxs:
         print(f"{CRED}[{mode} pytree leaf [{i}]]")
-        print("prev=", repr(tree_leaves(obj_a)[i]))
-        print("curr=", repr(tree_leaves(obj_b)[i]), CEND)
+        print("prev=", repr(leaves_a[i]))
+        print("curr=", repr(leaves_b[i]), CEND)
 
 def check_pytree_weak_type_match(obj_a, obj_b, mode="input", sig=None):
     """Checks whether pytrees A and B have the same weak_typing.
@@ -445,10 +627,11 @@ def check_pytree_weak_type_match(obj_a, obj_b, mode="input", sig=None):
     idxs = test_and_find_inequality(
         shape_a, shape_b, check_name="Pytree Leaf Device Array Weak Type", mode=mode, sig=None
     )
+    leaves_a, leaves_b = tree_leaves(obj_a), tree_leaves(obj_b)
     for i in idxs:
         print(f"{CRED}[{mode} pytree leaf [{i}]]")
-        print("prev=", repr(tree_leaves(obj_a)[i]))
-        print("curr=", repr(tree_leaves(obj_b)[i]), CEND)
+        print("prev=", repr(leaves_a[i]))
+        print("curr=", repr(leaves_b[i]), CEND)
 
 def check_pytree_dtype_match(obj_a, obj_b, mode="input", sig=None):
     """Checks whether pytrees A and B have the same dtype.
@@ -459,10 +642,11 @@ def check_pytree_dtype_match(obj_a, obj_b, mode="input", sig=None):
     idxs = test_and_find_inequality(
         shape_a, shape_b, check_name="Pytree Leaf Device Array dtype", mode=mode, sig=None
     )
+    leaves_a, leaves_b = tree_leaves(obj_a), tree_leaves(obj_b)
     for i in idxs:
         print(f"{CRED}[{mode} pytree leaf [{i}]]")
-        print("prev=", repr(tree_leaves(obj_a)[i]))
-        print("curr=", repr(tree_leaves(obj_b)[i]), CEND)
+        print("prev=", repr(leaves_a[i]))
+        print("curr=", repr(leaves_b[i]), CEND)
 
 
 def check_pytree_match(
@@ -481,9 +665,44 @@ def check_pytree_match(
             Used for better debug description. Defaults to None.
     """
     check_pytree_structure_match(obj_a, obj_b, mode, sig)
-    check_pytree_shape_match(obj_a, obj_b, mode, None)
-    check_pytree_weak_type_match(obj_a, obj_b, mode, None)
-    check_pytree_dtype_match(obj_a, obj_b, mode, None)
+
+    # Check the shape, weak typing, and dtype of the leaves in a single pass
+    # rather than flattening both pytrees once per property.
+    leaves_a = tree_leaves(obj_a)
+    leaves_b = tree_leaves(obj_b)
+    avals_a = [(x.shape, x.weak_type, x.dtype) for x in leaves_a]
+    avals_b = [(x.shape, x.weak_type, x.dtype) for x in leaves_b]
+    idxs = test_and_find_inequality(
+        avals_a, avals_b, check_name="PyTree Leaf (Shape, Weak Type, dtype)", mode=mode, sig=None
+    )
+    for i in idxs:
+        print(f"{CRED}[{mode} pytree leaf [{i}]]")
+        print("prev=", repr(leaves_a[i]))
+        print("curr=", repr(leaves_b[i]), CEND)
+
+
+def _pytree_fingerprint(tree):
+    """Summarize the structure and leaf shapes, weak types, and dtypes of a pytree.
+
+    Two pytrees with equal fingerprints will not trigger a re-jit.
+    """
+    leaves, treedef = tree_flatten(tree)
+    return treedef, tuple((x.shape, x.weak_type, x.dtype) for x in leaves)
+
+
+def _check_fingerprint_match(fp_prev, fp_curr, mode="input", sig=None):
+    """Report the differences between two pytree fingerprints.
+    Used for debugging re-jit problems (see debug_rejit decorator).
+    """
+    (struct_prev, avals_prev), (struct_curr, avals_curr) = fp_prev, fp_curr
+    if struct_prev != struct_curr:
+        test_and_find_inequality(
+            struct_prev.children(), struct_curr.children(),
+            check_name="PyTreeDef Structure", mode=mode, sig=sig
+        )
+    test_and_find_inequality(
+        avals_prev, avals_curr, check_name="PyTree Leaf (Shape, Weak Type, dtype)", mode=mode, sig=None
+    )
 
 
 def debug_rejit(func):
@@ -507,30 +726,37 @@ def debug_rejit(func):
 
     def wrapper(*args, **kwargs):
 
-        # get tree structure for args and kwargs
-        inputs = list(args) + list(kwargs.values())
-        if wrapper.prev_in is None:
-            wrapper.prev_in = inputs
+        # get tree structure for args and kwargs.
+        # Only the fingerprints are stored between calls, not the pytrees
+        # themselves, so that device buffers of previous calls can be freed.
+        in_fp = _pytree_fingerprint(list(args) + list(kwargs.values()))
+        if wrapper.prev_in_fp is None:
+            wrapper.prev_in_fp = in_fp
 
         # run the function
         outputs = func(*args, **kwargs)
 
         # get tree structure for output (this works for tuple outputs too)
-        if wrapper.prev_out is None:
-            wrapper.prev_out = outputs
-
-        # check whether the input and output structures match w/ prev fn call
-        check_pytree_match(inputs, wrapper.prev_in, mode="input", sig=wrapper.sig)
-        check_pytree_match(outputs, wrapper.prev_out, mode="output")
+        out_fp = _pytree_fingerprint(outputs)
+        if wrapper.prev_out_fp is None:
+            wrapper.prev_out_fp = out_fp
+
+        # check whether the input and output structures match w/ prev fn call.
+        # Comparing the fingerprints is cheap, so only report the differences
+        # once a mismatch has been found.
+        if in_fp != wrapper.prev_in_fp:
+            _check_fingerprint_match(wrapper.prev_in_fp, in_fp, mode="input", sig=wrapper.sig)
+        if out_fp != wrapper.prev_out_fp:
+            _check_fingerprint_match(wrapper.prev_out_fp, out_fp, mode="output")
 
         # store for next fn call
-        wrapper.prev_in = inputs
-        wrapper.prev_out = outputs
+        wrapper.prev_in_fp = in_fp
+        wrapper.prev_out_fp = out_fp
 
         # return the output
         return outputs
 
     wrapper.sig = inspect.getfullargspec(func)
-    wrapper.prev_in = None
-    wrapper.prev_out = None
+    wrapper.prev_in_fp = None
+    wrapper.prev_out_fp = None
     return wrapper
@@ -4,7 +4,12 @@ import jax.random as jr
 import jax.numpy as np
 from jax import jit
 
+from tensorflow_probability.substrates import jax as tfp
+
 from ssm.arhmm import GaussianARHMM
+from ssm.arhmm.emissions import _batched_mvn_log_prob
+from ssm.distributions import GaussianLinearRegression
+from ssm.twarhmm import GaussianTWARHMM
 
 SEED = jr.PRNGKey(0)
 
@@ -42,6 +47,77 @@ def test_gaussian_arhmm_sample_is_consistent():
     assert np.all(true_states == states)
     assert np.allclose(true_data, data, atol=1e-5)
     
+def test_gaussian_arhmm_log_probability():
+    rng1, rng2 = jr.split(SEED, 2)
+    arhmm = GaussianARHMM(3, 2, 1, seed=rng1)
+    states, data = arhmm.sample(rng2, num_steps=10, num_samples=4)
+    lps = arhmm.log_probability(states, data)
+    assert lps.shape == (4,)
+    assert np.all(np.isfinite(lps))
+
+def test_gaussian_twarhmm_log_probability():
+    # factorial states are a tuple of arrays rather than a single integer array
+    rng1, rng2 = jr.split(SEED, 2)
+    twarhmm = GaussianTWARHMM(3, np.array([0.5, 1.0, 2.0]), 2, seed=rng1)
+    states, data = twarhmm.sample(rng2, num_steps=10, num_samples=4)
+    lps = twarhmm.log_probability(states, data)
+    assert lps.shape == (4,)
+    assert np.all(np.isfinite(lps))
+
+def test_gaussian_arhmm_reduced_precision_log_probability():
+    rng1, rng2 = jr.split(SEED, 2)
+    arhmm = GaussianARHMM(3, 2, 1, seed=rng1)
+    reduced_arhmm = GaussianARHMM(3, 2, 1, seed=rng1, emission_compute_dtype=np.bfloat16)
+    states, data = arhmm.sample(rng2, num_steps=10, num_samples=4)
+    lps = arhmm.log_probability(states, data)
+    reduced_lps = reduced_arhmm.log_probability(states, data)
+    assert reduced_lps.dtype == lps.dtype
+    assert np.allclose(reduced_lps, lps, rtol=5e-2)
+
+def test_gaussian_arhmm_chunked_m_step():
+    # 5 series in chunks of 2, so the last chunk is padded
+    rng1, rng2 = jr.split(SEED, 2)
+    arhmm = GaussianARHMM(3, 2, 1, seed=rng1)
+    chunked_arhmm = GaussianARHMM(3, 2, 1, seed=rng1, emission_m_step_batch_size=2)
+    states, data = arhmm.sample(rng2, num_steps=20, num_samples=5)
+    posterior = arhmm.e_step(data)
+    arhmm.m_step(data, posterior)
+    chunked_arhmm.m_step(data, posterior)
+    assert np.allclose(chunked_arhmm.emission_weights, arhmm.emission_weights, atol=1e-5)
+    assert np.allclose(chunked_arhmm.emission_biases, arhmm.emission_biases, atol=1e-5)
+    assert np.allclose(chunked_arhmm.emission_covariances, arhmm.emission_covariances, atol=1e-5)
+
+def test_batched_mvn_log_prob_matches_tfd():
+    rng1, rng2, rng3 = jr.split(SEED, 3)
+    data = jr.normal(rng1, (6, 3))
+    means = jr.normal(rng2, (6, 4, 3))
+    scale_trils = np.tril(jr.normal(rng3, (4, 3, 3)), -1) + np.diag(np.array([0.5, 1.0, 2.0]))
+    log_probs = _batched_mvn_log_prob(data, means, scale_trils)
+    expected = tfp.distributions.MultivariateNormalTriL(means, scale_trils).log_prob(data[:, None])
+    assert log_probs.shape == (6, 4)
+    assert np.allclose(log_probs, expected, atol=1e-4)
+
+def test_gaussian_arhmm_sufficient_statistics_match_per_step():
+    num_states, dim, num_lags = 3, 2, 2
+    rng1, rng2, rng3 = jr.split(SEED, 3)
+    arhmm = GaussianARHMM(num_states, dim, num_lags, seed=rng1)
+    data = jr.normal(rng2, (2, 6, dim))
+    expected_states = jr.dirichlet(rng3, np.ones(num_states), (2, 6))
+    stats = arhmm._emissions._sufficient_statistics(data, expected_states)
+
+    # accumulate the per-step statistics of each window and following emission
+    expected = [0.] * len(stats)
+    for b in range(data.shape[0]):
+        for t in range(num_lags, data.shape[1]):
+            step_stats = GaussianLinearRegression.sufficient_statistics(
+                data[b, t], data[b, t - num_lags:t].ravel())
+            expected = [e + np.einsum('k,...->k...', expected_states[b, t], np.asarray(s))
+                        for e, s in zip(expected, step_stats)]
+
+    assert len(stats) == len(expected)
+    for s, e in zip(stats, expected):
+        assert np.allclose(s, e, atol=1e-4)
+
 def test_gaussian_arhmm_em_fit():
     rng1, rng2, rng3 = jr.split(SEED, 3)
 
@@ -1,5 +1,5 @@
 import tensorflow_probability.substrates.jax as tfp
-from jax.interpreters import xla
+import jax
 import jax.random as jr
 import jax.numpy as np
 import pytest
@@ -60,7 +60,7 @@ def hmm_fit_em_setup(
 
 def hmm_fit_em(hmm, data, num_iters, params):
     lp, fit_model, posteriors = hmm.fit(data, method="em", num_iters=num_iters, tol=-1)
-    last_lp = lp[-1].block_until_ready()  # explicitly block until ready
+    jax.block_until_ready(lp)  # explicitly block until ready
     return lp, params
 
 
@@ -156,3 +156,86 @@ def test_ensure_has_batch_dim(emissions_shape):
     batched_res = f(batched_data, batched_y, model)
     assert batched_res.shape == (batch_dim,) + emissions_shape
         
+
+
+def test_kmeans():
+    key1, key2 = jax.random.split(jax.random.PRNGKey(0))
+    centers = np.array([[-10., -10.], [0., 10.], [10., -10.]])
+    true_assignments = jax.random.choice(key1, 3, (300,))
+    data = centers[true_assignments] + jax.random.normal(key2, (300, 2))
+
+    assignments, centroids = utils.kmeans(jax.random.PRNGKey(1), data, 3)
+    assert assignments.shape == (300,)
+    assert centroids.shape == (3, 2)
+
+    # each cluster should be recovered up to a permutation of the labels
+    perm = utils.find_permutation(true_assignments, assignments)
+    assert np.all(perm[true_assignments] == assignments)
+
+
+def test_compute_state_overlap():
+    z1 = np.array([0, 0, 1, 2, 2, 2])
+    z2 = np.array([1, 1, 0, 2, 2, 0])
+    overlap = utils.compute_state_overlap(z1, z2)
+    assert np.all(overlap == np.array([[0, 2, 0],
+                                       [1, 0, 0],
+                                       [1, 0, 2]]))
+
+    # explicit upper bounds pad the overlap matrix with zeros
+    overlap = utils.compute_state_overlap(z1, z2, K1=4, K2=5)
+    assert overlap.shape == (4, 5)
+    assert overlap.sum() == len(z1)
+
+    # states beyond explicit upper bounds are ignored rather than miscounted
+    overlap = utils.compute_state_overlap(z1, z2, K1=2, K2=2)
+    assert np.all(overlap == np.array([[0, 2],
+                                       [1, 0]]))
+
+
+def test_find_permutation_pads_unused_states():
+    z1 = np.array([0, 0, 1, 1])
+    z2 = np.array([2, 2, 0, 0])
+    perm = utils.find_permutation(z1, z2, K2=4)
+    assert list(perm) == [2, 0, 1, 3]
+
+
+def test_one_hot():
+    z = np.array([[0, 2, 1, 2, 2]])
+    zoh = utils.one_hot(z, 3)
+    assert zoh.shape == (1, 5, 3)
+    assert np.all(zoh.sum(axis=-1) == 1)
+    assert np.all(zoh.argmax(axis=-1) == z)
+
+
+def test_logspace_tensordot():
+    key1, key2 = jax.random.split(jax.random.PRNGKey(0))
+    tensor = jax.random.normal(key1, (2, 3, 4))
+    matrix = jax.random.normal(key2, (3, 5))
+    result = utils.logspace_tensordot(tensor, matrix, 1)
+    expected = np.log(np.einsum('imk,mn->ink', np.exp(tensor), np.exp(matrix)))
+    assert result.shape == (2, 5, 4)
+    assert np.allclose(result, expected, atol=1e-5)
+
+
+def test_logspace_tensordot_with_infinite_entries():
+    # the largest tensor and matrix entries fall on different contracted indices
+    tensor = np.array([0., -100.])
+    matrix = np.array([[-np.inf, 0.], [0., 0.]])
+    result = utils.logspace_tensordot(tensor, matrix, 0)
+    assert np.allclose(result, np.array([-100., 0.]))
+
+    grad = jax.grad(lambda t: utils.logspace_tensordot(t, matrix, 0).sum())(tensor)
+    assert np.all(np.isfinite(grad))
+    assert np.allclose(grad, np.array([1., 1.]))
+
+
+def test_random_rotation_is_traceable():
+    key = jax.random.PRNGKey(0)
+    expected = utils.random_rotation(key, 3, theta=np.pi / 20)
+    jitted = jax.jit(lambda k: utils.random_rotation(k, 3, theta=np.pi / 20))(key)
+    assert np.allclose(jitted, expected, atol=1e-5)
+
+    keys = jax.random.split(key, 4)
+    rotations = jax.vmap(lambda k: utils.random_rotation(k, 3))(keys)
+    assert rotations.shape == (4, 3, 3)
+    assert np.allclose(rotations[0], utils.random_rotation(keys[0], 3), atol=1e-5)